@@ -2,18 +2,16 @@ import abc
 import asyncio
 import dataclasses
 import multiprocessing
-import os
 import queue
-import tempfile
 import time
-import wave
 import typing
 
 import dataclasses_json
 import librosa  # type: ignore
+import numpy as np
 import pyaudio  # type: ignore
 
-from social_reward_function.util import CodeBlockTimer
+from social_reward_function.util import CodeBlockTimer, acquire_async
 
 
 @dataclasses_json.dataclass_json(undefined='raise')
@@ -56,8 +54,7 @@ class AudioFrameGenerator(abc.ABC):
             if not self._proc.is_alive():
                 self._proc.start()
             while self._proc.is_alive() or not self._queue.empty():
-                if not self._semaphore.acquire(block=False):
-                    await asyncio.sleep(0)
+                if not await acquire_async(self._semaphore, timeout_s=1e-1):
                     continue
                 elem = self._queue.get()
                 yield elem
@@ -71,11 +68,7 @@ class MicrophoneFrameGenerator(AudioFrameGenerator):
     FORMAT = pyaudio.paInt16  # paInt8
     CHANNELS = 1
     RATE = 44100  # sample rate
-
-    def __enter__(self) -> 'MicrophoneFrameGenerator':
-        self._temp_dir = tempfile.TemporaryDirectory()
-        self._temp_dir.__enter__()
-        return self
+    RESAMPLE_RATE = 22050  # sample rate of yielded audio (librosa's default)
 
     def _gen(self) -> None:
         _pyaudio = pyaudio.PyAudio()
@@ -89,7 +82,8 @@ class MicrophoneFrameGenerator(AudioFrameGenerator):
         chunks_per_segment = int(MicrophoneFrameGenerator.RATE / MicrophoneFrameGenerator.CHUNK * self._segment_duration_s)
         chunks_per_period = float(MicrophoneFrameGenerator.RATE / MicrophoneFrameGenerator.CHUNK * self._segment_duration_s * self._period_propn)
 
-        frames = []
+        # Consecutive segments overlap, so each chunk is decoded once and kept until it's no longer needed:
+        frames: typing.List[typing.Any] = []
         time_initial = time.time()
         remainder_counter = 0.0
         try:
@@ -99,20 +93,14 @@ class MicrophoneFrameGenerator(AudioFrameGenerator):
                 print(f"Getting a fresh audio segment @ {segment_timestamp}")
                 with CodeBlockTimer() as code_block_timer:
                     for _ in range(chunks_per_segment):
-                        frames.append(_stream.read(MicrophoneFrameGenerator.CHUNK))  # 2 bytes(16 bits) per channel
+                        frames.append(MicrophoneFrameGenerator._decode_chunk(
+                            _stream.read(MicrophoneFrameGenerator.CHUNK),
+                            sample_width=_pyaudio.get_sample_size(MicrophoneFrameGenerator.FORMAT)))  # 2 bytes(16 bits) per channel
                 print(f"Fresh audio segment retrieval took {code_block_timer.timedelta}")
 
                 with CodeBlockTimer() as code_block_timer:
                     while len(frames) >= chunks_per_segment:
-                        # TODO(TK): ideally convert from frames to waveform without writing to file
-                        temp_file = os.path.join(self._temp_dir.name, 'tmp.wav')
-                        with wave.open(temp_file, 'wb') as wf:
-                            wf.setnchannels(MicrophoneFrameGenerator.CHANNELS)
-                            wf.setsampwidth(_pyaudio.get_sample_size(MicrophoneFrameGenerator.FORMAT))
-                            wf.setframerate(MicrophoneFrameGenerator.RATE)
-                            wf.writeframes(b''.join(frames[:chunks_per_segment]))
-
-                        audio_data, sample_rate = librosa.load(temp_file)
+                        audio_data, sample_rate = MicrophoneFrameGenerator._to_audio_data(frames[:chunks_per_segment])
                         timestamp = segment_timestamp - len(frames) / MicrophoneFrameGenerator.RATE * MicrophoneFrameGenerator.CHUNK
 
                         self._queue.put(AudioFrame(timestamp_s=timestamp, audio_data=audio_data, sample_rate=sample_rate))
@@ -131,6 +119,26 @@ class MicrophoneFrameGenerator(AudioFrameGenerator):
             _stream.close()
             _pyaudio.terminate()
 
+    @staticmethod
+    def _decode_chunk(chunk: bytes, sample_width: int) -> typing.Any:
+        """
+        Decodes a chunk of interleaved integer samples to floats in [-1, 1)
+        """
+
+        return librosa.util.buf_to_float(chunk, n_bytes=sample_width)
+
+    @staticmethod
+    def _to_audio_data(decoded_chunks: typing.Sequence[typing.Any]) -> typing.Tuple[typing.Any, int]:
+        """
+        Joins decoded chunks into a segment resampled to RESAMPLE_RATE, as librosa.load would for a WAV file of the chunks
+        """
+
+        audio_data = librosa.resample(
+            np.concatenate(decoded_chunks),
+            orig_sr=MicrophoneFrameGenerator.RATE,
+            target_sr=MicrophoneFrameGenerator.RESAMPLE_RATE)
+        return audio_data, MicrophoneFrameGenerator.RESAMPLE_RATE
+
 
 class AudioFileFrameGenerator(AudioFrameGenerator):
     def __init__(self, file: str, segment_duration_s: float, period_propn: float) -> None:
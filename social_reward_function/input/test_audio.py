@@ -0,0 +1,37 @@
+import os
+import tempfile
+import wave
+
+import librosa  # type: ignore
+import numpy as np
+
+from social_reward_function.input.audio import MicrophoneFrameGenerator
+
+
+def test_microphone_frame_generator_decoding_matches_wav() -> None:
+    sample_width = 2  # pyaudio.paInt16
+    rng = np.random.default_rng(42)
+    chunks = [
+        rng.integers(-2 ** 15, 2 ** 15, size=MicrophoneFrameGenerator.CHUNK, dtype=np.int16).tobytes()
+        for _ in range(20)
+    ]
+
+    # Decode as per MicrophoneFrameGenerator:
+    audio_data, sample_rate = MicrophoneFrameGenerator._to_audio_data([
+        MicrophoneFrameGenerator._decode_chunk(chunk, sample_width=sample_width)
+        for chunk in chunks
+    ])
+
+    # Decode via a WAV file:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        wav_file = os.path.join(tmp_dir, 'tmp.wav')
+        with wave.open(wav_file, 'wb') as wf:
+            wf.setnchannels(MicrophoneFrameGenerator.CHANNELS)
+            wf.setsampwidth(sample_width)
+            wf.setframerate(MicrophoneFrameGenerator.RATE)
+            wf.writeframes(b''.join(chunks))
+        audio_data_expected, sample_rate_expected = librosa.load(wav_file)
+
+    assert sample_rate == sample_rate_expected
+    assert audio_data.dtype == audio_data_expected.dtype
+    assert np.allclose(audio_data, audio_data_expected)
@@ -11,6 +11,8 @@ import cv2  # type: ignore
 import dataclasses_json
 from ffpyplayer.player import MediaPlayer  # type: ignore
 
+from social_reward_function.util import acquire_async
+
 
 @dataclasses_json.dataclass_json(undefined='raise')
 @dataclasses.dataclass(frozen=True)
@@ -61,8 +63,7 @@ class VideoFrameGenerator(abc.ABC):
             if not self._proc.is_alive():
                 self._proc.start()
             while self._proc.is_alive() or not self._queue_live.empty():
-                if not self._semaphore_live.acquire(block=False):
-                    await asyncio.sleep(0)
+                if not await acquire_async(self._semaphore_live, timeout_s=1e-1):
                     continue
                 elem = self._queue_live.get()
                 yield elem
@@ -75,8 +76,7 @@ class VideoFrameGenerator(abc.ABC):
             if not self._proc.is_alive():
                 self._proc.start()
             while self._proc.is_alive() or not self._queue_live.empty():
-                if not self._semaphore_downsampled.acquire(block=False):
-                    await asyncio.sleep(0)
+                if not await acquire_async(self._semaphore_downsampled, timeout_s=1e-1):
                     continue
                 elem = self._queue_downsampled.get()
                 yield elem
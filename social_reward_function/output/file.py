@@ -6,7 +6,6 @@ import typing
 
 import dataclasses_json
 import numpy as np
-import pandas as pd  # type: ignore
 import yaml
 
 from social_reward_function.reward_function import RewardSignal
@@ -87,13 +86,36 @@ class RewardSignalFileWriter:
                                                  if reward_signal.audio_reward is not None])),
                 },
                 'emotions': {
-                    'mean_video': pd.concat([reward_signal.detected_video_emotions for reward_signal in self._list_reward_signal]).mean().to_dict()
-                    if len(self._list_reward_signal) != 0 else {},
-                    'mean_audio': pd.concat([reward_signal.detected_audio_emotions for reward_signal in self._list_reward_signal]).mean().to_dict()
-                    if len(self._list_reward_signal) != 0 else {},
+                    'mean_video': RewardSignalFileWriter._mean_detected_emotions([
+                        (reward_signal.video_emotion_labels, reward_signal.detected_video_emotion_probabilities)
+                        for reward_signal in self._list_reward_signal
+                    ]),
+                    'mean_audio': RewardSignalFileWriter._mean_detected_emotions([
+                        (reward_signal.audio_emotion_labels, reward_signal.detected_audio_emotion_probabilities)
+                        for reward_signal in self._list_reward_signal
+                    ]),
                 }
             }
         }
 
+    @staticmethod
+    def _mean_detected_emotions(
+            detected_emotions: typing.Sequence[typing.Tuple[typing.Tuple[str, ...], typing.Any]],
+    ) -> typing.Dict[str, float]:
+        """
+        Mean probability of each emotion over all (labels, probabilities) pairs, which must share the same labels. Empty if
+        no emotions were detected, as NaN isn't valid JSON
+        """
+
+        if len(detected_emotions) == 0:
+            return {}
+        labels = detected_emotions[0][0]
+        if any(other_labels != labels for other_labels, _ in detected_emotions):
+            raise ValueError("Reward signals have inconsistent emotions")
+        probabilities = np.concatenate([probabilities for _, probabilities in detected_emotions])
+        if len(probabilities) == 0:
+            return {}
+        return {label: float(np.mean(probabilities[:, idx])) for idx, label in enumerate(labels)}
+
     def append_reward_signal(self, reward_signal: RewardSignal) -> None:
         self._list_reward_signal.append(reward_signal)
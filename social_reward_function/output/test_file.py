@@ -1,10 +1,11 @@
+import dataclasses
 import json
 import os
 import random
 import tempfile
 import typing
 
-import pandas as pd  # type: ignore
+import numpy as np
 import pytest
 
 from social_reward_function.output.file import FileOutputConfig, RewardSignalFileWriter
@@ -20,12 +21,16 @@ def fake_reward_signal() -> typing.List[RewardSignal]:
             combined_reward=random.random(),
             audio_reward=random.random(),
             video_reward=random.random(),
-            detected_video_emotions=pd.DataFrame(data=[
-                {'a': random.random(), 'b': random.random()} for _ in range(5)
+            presence_reward=0.0,
+            human_detected=True,
+            detected_video_emotion_probabilities=np.array([
+                [random.random(), random.random()] for _ in range(5)
             ]),
-            detected_audio_emotions=pd.DataFrame(data=[
-                {'c': random.random(), 'd': random.random()} for _ in range(5)
+            detected_audio_emotion_probabilities=np.array([
+                [random.random(), random.random()] for _ in range(5)
             ]),
+            video_emotion_labels=('a', 'b'),
+            audio_emotion_labels=('c', 'd'),
         )
         for idx in range(3)
     ]
@@ -98,6 +103,33 @@ def test_write_reward_signal_summary_json(fake_reward_signal: typing.List[Reward
             }
 
 
+def test_write_reward_signal_summary_json_no_emotions_detected(fake_reward_signal: typing.List[RewardSignal]) -> None:
+    def raise_on_constant(constant: str) -> None:
+        raise ValueError(f"Invalid JSON constant {constant}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, 'output.json')
+        config = FileOutputConfig(
+            path=output_file,
+            overwrite=True,
+            enabled=True,
+        )
+        with RewardSignalFileWriter(config=config) as file_writer:
+            for reward_signal in fake_reward_signal:
+                file_writer.append_reward_signal(reward_signal=dataclasses.replace(
+                    reward_signal,
+                    detected_audio_emotion_probabilities=np.zeros((0, 2)),
+                ))
+
+        with open(output_file) as f_output_file:
+            json_output_file = json.load(f_output_file, parse_constant=raise_on_constant)
+            assert json_output_file['summary']['emotions']['mean_audio'] == {}
+            assert json_output_file['summary']['emotions']['mean_video'] == {
+                'a': 0.46889227456526855,
+                'b': 0.4580541635040654,
+            }
+
+
 def test_write_reward_signal_summary_yaml(fake_reward_signal: typing.List[RewardSignal]) -> None:
     with tempfile.TemporaryDirectory() as tmp_dir:
         output_file = os.path.join(tmp_dir, 'output.yaml')
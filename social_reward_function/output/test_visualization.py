@@ -0,0 +1,83 @@
+import typing
+
+import numpy as np
+
+from social_reward_function.output.visualization import _RewardSignalHistory
+from social_reward_function.reward_function import RewardSignal, EMOTIONS
+
+
+def _reward_signal(
+        timestamp_s: float,
+        audio_reward: typing.Optional[float] = 0.0,
+        video_reward: typing.Optional[float] = 0.0,
+) -> RewardSignal:
+    return RewardSignal(
+        timestamp_s=timestamp_s,
+        combined_reward=2 * timestamp_s,
+        audio_reward=audio_reward,
+        video_reward=video_reward,
+        presence_reward=0.5,
+        human_detected=True,
+        detected_audio_emotion_probabilities=np.zeros((0, len(EMOTIONS))),
+        detected_video_emotion_probabilities=np.zeros((0, len(EMOTIONS))),
+    )
+
+
+def test_reward_signal_history_append() -> None:
+    history = _RewardSignalHistory()
+    assert len(history.timestamp_s) == 0
+
+    history.append(_reward_signal(timestamp_s=1.0, audio_reward=0.1, video_reward=0.2))
+    history.append(_reward_signal(timestamp_s=2.0, audio_reward=0.3, video_reward=0.4))
+    assert np.array_equal(history.timestamp_s, [1.0, 2.0])
+    assert np.array_equal(history.combined_reward, [2.0, 4.0])
+    assert np.array_equal(history.audio_reward, [0.1, 0.3])
+    assert np.array_equal(history.video_reward, [0.2, 0.4])
+    assert np.array_equal(history.presence_reward, [0.5, 0.5])
+
+
+def test_reward_signal_history_missing_rewards() -> None:
+    history = _RewardSignalHistory()
+    history.append(_reward_signal(timestamp_s=1.0, audio_reward=None, video_reward=0.2))
+    history.append(_reward_signal(timestamp_s=2.0, audio_reward=0.3, video_reward=None))
+    assert np.array_equal(history.audio_reward, [np.nan, 0.3], equal_nan=True)
+    assert np.array_equal(history.video_reward, [0.2, np.nan], equal_nan=True)
+
+
+def test_reward_signal_history_drop_older_than() -> None:
+    history = _RewardSignalHistory()
+    for timestamp_s in [1.0, 2.0, 3.0, 4.0]:
+        history.append(_reward_signal(timestamp_s=timestamp_s))
+
+    history.drop_older_than(2.5)
+    assert np.array_equal(history.timestamp_s, [3.0, 4.0])
+    history.drop_older_than(3.0)  # inclusive
+    assert np.array_equal(history.timestamp_s, [3.0, 4.0])
+    history.drop_older_than(10.0)
+    assert len(history.timestamp_s) == 0
+
+
+def test_reward_signal_history_grows_past_capacity() -> None:
+    history = _RewardSignalHistory(capacity=4)
+    for idx in range(10):
+        history.append(_reward_signal(timestamp_s=float(idx)))
+    assert np.array_equal(history.timestamp_s, np.arange(10.0))
+    assert np.array_equal(history.combined_reward, 2 * np.arange(10.0))
+
+
+def test_reward_signal_history_matches_list_window() -> None:
+    window_width_s = 3.0
+    history = _RewardSignalHistory(capacity=4)
+    reward_signals: typing.List[RewardSignal] = []
+    for idx in range(200):
+        reward_signal = _reward_signal(timestamp_s=0.5 * idx, audio_reward=None if idx % 3 == 0 else float(idx))
+        history.append(reward_signal)
+        history.drop_older_than(reward_signal.timestamp_s - window_width_s)
+        reward_signals.append(reward_signal)
+        reward_signals = [elem for elem in reward_signals if reward_signal.timestamp_s - elem.timestamp_s <= window_width_s]
+
+        assert np.array_equal(history.timestamp_s, [elem.timestamp_s for elem in reward_signals])
+        assert np.array_equal(
+            history.audio_reward,
+            [elem.audio_reward if elem.audio_reward is not None else np.nan for elem in reward_signals],
+            equal_nan=True)
@@ -1,6 +1,5 @@
 import dataclasses
 import functools
-import math
 import sys
 import time
 import typing
@@ -10,9 +9,12 @@ import dataclasses_json
 import matplotlib  # type: ignore
 import numpy as np
 from matplotlib import pyplot as plt
+from matplotlib.axes import Axes  # type: ignore
+from matplotlib.container import BarContainer  # type: ignore
 from matplotlib.image import AxesImage  # type: ignore
+from matplotlib.lines import Line2D  # type: ignore
 
-from social_reward_function.reward_function import RewardSignal
+from social_reward_function.reward_function import RewardSignal, EMOTIONS
 from social_reward_function.input.video import VideoFrame
 
 
@@ -26,7 +28,79 @@ class VisualizationOutputConfig:
     display_plots: bool
 
 
+class _RewardSignalHistory:
+    """
+    The timestamps and rewards of a window of RewardSignals, stored as rows of one array so they can be windowed with a
+    binary search and plotted without conversion. Missing rewards are NaN.
+    """
+
+    _ROW_TIMESTAMP_S, _ROW_COMBINED_REWARD, _ROW_AUDIO_REWARD, _ROW_VIDEO_REWARD, _ROW_PRESENCE_REWARD = range(5)
+
+    def __init__(self, capacity: int = 64) -> None:
+        # TODO(TK): bring back types with numpy>=1.20
+        self._data: typing.Any = np.empty((5, capacity))
+        self._begin = 0
+        self._end = 0
+
+    def append(self, reward_signal: RewardSignal) -> None:
+        """
+        Appends a RewardSignal, which must be no older than those already appended
+        """
+
+        if self._end == self._data.shape[1]:
+            self._compact()
+        self._data[:, self._end] = [
+            reward_signal.timestamp_s,
+            reward_signal.combined_reward,
+            reward_signal.audio_reward if reward_signal.audio_reward is not None else np.nan,
+            reward_signal.video_reward if reward_signal.video_reward is not None else np.nan,
+            reward_signal.presence_reward,
+        ]
+        self._end += 1
+
+    def drop_older_than(self, timestamp_s: float) -> None:
+        self._begin += int(np.searchsorted(self.timestamp_s, timestamp_s, side='left'))
+
+    def _compact(self) -> None:
+        """
+        Moves the window to the front of a new array, doubling the capacity if the window fills more than half of it
+        """
+
+        length = self._end - self._begin
+        capacity = self._data.shape[1] * (2 if 2 * length > self._data.shape[1] else 1)
+        data = np.empty((5, capacity))
+        data[:, :length] = self._data[:, self._begin:self._end]
+        self._data = data
+        self._begin = 0
+        self._end = length
+
+    @property
+    def timestamp_s(self) -> typing.Any:
+        return self._data[_RewardSignalHistory._ROW_TIMESTAMP_S, self._begin:self._end]
+
+    @property
+    def combined_reward(self) -> typing.Any:
+        return self._data[_RewardSignalHistory._ROW_COMBINED_REWARD, self._begin:self._end]
+
+    @property
+    def audio_reward(self) -> typing.Any:
+        return self._data[_RewardSignalHistory._ROW_AUDIO_REWARD, self._begin:self._end]
+
+    @property
+    def video_reward(self) -> typing.Any:
+        return self._data[_RewardSignalHistory._ROW_VIDEO_REWARD, self._begin:self._end]
+
+    @property
+    def presence_reward(self) -> typing.Any:
+        return self._data[_RewardSignalHistory._ROW_PRESENCE_REWARD, self._begin:self._end]
+
+
 class RewardSignalVisualizer:
+    _color_combined = '#ff0000'
+    _color_audio = '#007700'
+    _color_video = '#000077'
+    _color_presence = '#777700'
+
     def __init__(self, config: VisualizationOutputConfig) -> None:
         self._config = config
 
@@ -40,14 +114,34 @@ class RewardSignalVisualizer:
             self._ax_emotions_live = plt.subplot2grid((2, 2), (1, 0), rowspan=1, colspan=1)
             self._ax_emotions_average = plt.subplot2grid((2, 2), (1, 1), rowspan=1, colspan=1)
 
+            # The reward artists are created once and updated in place on each draw:
+            self._ax_reward.axhline(y=0, color='k', alpha=0.5)  # x-axis
+            self._line_average_combined = self._ax_reward.axhline(
+                y=0, color=RewardSignalVisualizer._color_combined, linestyle='--', alpha=0.5, visible=False)
+            self._line_average_video = self._ax_reward.axhline(
+                y=0, color=RewardSignalVisualizer._color_video, linestyle='--', alpha=0.5, visible=False)
+            self._line_average_audio = self._ax_reward.axhline(
+                y=0, color=RewardSignalVisualizer._color_audio, linestyle='--', alpha=0.5, visible=False)
+            self._line_combined, = self._ax_reward.plot([], [], marker='x', color=RewardSignalVisualizer._color_combined, label='combined')
+            self._line_audio, = self._ax_reward.plot([], [], marker='x', color=RewardSignalVisualizer._color_audio, label='audio')
+            self._line_video, = self._ax_reward.plot([], [], marker='x', color=RewardSignalVisualizer._color_video, label='video')
+            self._line_presence, = self._ax_reward.plot([], [], marker='x', color=RewardSignalVisualizer._color_presence, label='presence')
+            self._ax_reward.set_title('Reward')
+            self._ax_reward.set_ylabel('reward')
+            self._ax_reward.set_xlabel('time')
+            self._ax_reward.legend(loc='lower left')
+            self._bars_video_live, self._bars_audio_live = RewardSignalVisualizer._init_emotions_axes(
+                self._ax_emotions_live, 'Detected Emotions (Live)')
+            self._bars_video_average, self._bars_audio_average = RewardSignalVisualizer._init_emotions_axes(
+                self._ax_emotions_average, 'Detected Emotions (Moving Average)')
+
             plt.show(block=False)
             plt.gcf().canvas.flush_events()
 
             self._time_begin: typing.Optional[float] = None
             self._video_frame_counter = 0
             self._axes_image: typing.Optional[AxesImage] = None
-            self._reward_signal: typing.List[RewardSignal] = []
-            self._observed_emotions: typing.List[str] = []
+            self._reward_signal = _RewardSignalHistory()
             self._max_observed_audio_power = 5e-3
             self._max_observed_reward = 1.0
             self._min_observed_reward = -1.0
@@ -64,6 +158,7 @@ class RewardSignalVisualizer:
 
     def _draw(self) -> None:
         if self._config.display_plots:
+            plt.gcf().canvas.draw_idle()
             plt.gcf().canvas.flush_events()
             plt.show(block=False)
             plt.gcf().canvas.flush_events()
@@ -84,6 +179,55 @@ class RewardSignalVisualizer:
     def draw_video_downsampled(self, video_frame: VideoFrame) -> None:
         self._draw_video_frame(video_frame=video_frame, title='Video (downsampled)')
 
+    @staticmethod
+    def _init_emotions_axes(ax: Axes, title: str) -> typing.Tuple[BarContainer, BarContainer]:
+        """
+        Creates a bar for each of video and audio for each emotion, with zero height
+        """
+
+        bars_video = ax.bar(
+            x=np.arange(len(EMOTIONS)) - 0.25,
+            height=np.zeros(len(EMOTIONS)),
+            color=RewardSignalVisualizer._color_video,
+            width=0.5,
+            label='video',
+        )
+        bars_audio = ax.bar(
+            x=np.arange(len(EMOTIONS)) + 0.25,
+            height=np.zeros(len(EMOTIONS)),
+            color=RewardSignalVisualizer._color_audio,
+            width=0.5,
+            label='audio',
+        )
+        ax.set_ylim(bottom=0.0, top=1.0)
+        ax.set_xticks(np.arange(len(EMOTIONS)))
+        ax.set_xticklabels(EMOTIONS)
+        ax.set_title(title)
+        ax.legend(loc='upper right')
+        return bars_video, bars_audio
+
+    @staticmethod
+    def _set_bar_heights(bars: BarContainer, labels: typing.Tuple[str, ...], mean_probabilities: typing.Any) -> None:
+        """
+        Sets the bar for each emotion to its mean probability, or zero if it wasn't detected
+        """
+
+        if labels != EMOTIONS:
+            raise ValueError(f"Unexpected emotions: got {labels} expected {EMOTIONS}")
+        heights = np.nan_to_num(mean_probabilities)
+        for bar, height in zip(bars, heights):
+            bar.set_height(height)
+
+    @staticmethod
+    def _set_axhline(line: Line2D, y: typing.Optional[float]) -> None:
+        """
+        Moves a line created by axhline to y, or hides it if y is None
+        """
+
+        if y is not None:
+            line.set_ydata([y, y])
+        line.set_visible(y is not None)
+
     # TODO(TK): This doesn't need to be async
     async def draw_reward_signal(
             self,
@@ -117,132 +261,42 @@ class RewardSignalVisualizer:
 
         # Append the new reward signal and drop old data points:
         self._reward_signal.append(reward_signal)
-        self._reward_signal = [elem for elem in self._reward_signal if reward_signal.timestamp_s - elem.timestamp_s <= self._config.reward_window_width_s]
-
-        color_combined = '#ff0000'
-        color_audio = '#007700'
-        color_video = '#000077'
-        color_presence = '#777700'
-
-        self._ax_reward.clear()
-        self._ax_reward.axhline(y=0, color='k', alpha=0.5)  # x-axis
-        if average_reward_signal is not None:
-            self._ax_reward.axhline(y=average_reward_signal.combined_reward, color=color_combined, linestyle='--', alpha=0.5)
-            if average_reward_signal.video_reward is not None:
-                self._ax_reward.axhline(y=average_reward_signal.video_reward, color=color_video, linestyle='--', alpha=0.5)
-            if average_reward_signal.audio_reward is not None:
-                self._ax_reward.axhline(y=average_reward_signal.audio_reward, color=color_audio, linestyle='--', alpha=0.5)
-        self._ax_reward.plot(
-            [elem.timestamp_s for elem in self._reward_signal],
-            [elem.combined_reward for elem in self._reward_signal],
-            marker='x',
-            color=color_combined,
-            label='combined')
-        self._ax_reward.plot(
-            [elem.timestamp_s for elem in self._reward_signal],
-            [elem.audio_reward for elem in self._reward_signal],
-            marker='x',
-            color=color_audio,
-            label='audio')
-        self._ax_reward.plot(
-            [elem.timestamp_s for elem in self._reward_signal],
-            [elem.video_reward for elem in self._reward_signal],
-            marker='x',
-            color=color_video,
-            label='video')
-        self._ax_reward.plot(
-            [elem.timestamp_s for elem in self._reward_signal],
-            [elem.presence_reward for elem in self._reward_signal],
-            marker='x',
-            color=color_presence,
-            label='presence')
+        self._reward_signal.drop_older_than(reward_signal.timestamp_s - self._config.reward_window_width_s)
+
+        # Update the reward artists in place:
+        RewardSignalVisualizer._set_axhline(
+            self._line_average_combined, average_reward_signal.combined_reward if average_reward_signal is not None else None)
+        RewardSignalVisualizer._set_axhline(
+            self._line_average_video, average_reward_signal.video_reward if average_reward_signal is not None else None)
+        RewardSignalVisualizer._set_axhline(
+            self._line_average_audio, average_reward_signal.audio_reward if average_reward_signal is not None else None)
+        self._line_combined.set_data(self._reward_signal.timestamp_s, self._reward_signal.combined_reward)
+        self._line_audio.set_data(self._reward_signal.timestamp_s, self._reward_signal.audio_reward)
+        self._line_video.set_data(self._reward_signal.timestamp_s, self._reward_signal.video_reward)
+        self._line_presence.set_data(self._reward_signal.timestamp_s, self._reward_signal.presence_reward)
 
         timestamp_max = max(reward_signal.timestamp_s, self._config.reward_window_width_s)
-        self._max_observed_reward = max(elem for elem in [
-            self._max_observed_reward,
-            np.max(reward_signal.combined_reward),  # type: ignore
-            np.max(reward_signal.audio_reward) if reward_signal.audio_reward is not None else -math.inf,  # type: ignore
-            np.max(reward_signal.video_reward) if reward_signal.video_reward is not None else -math.inf,  # type: ignore
-            np.max(reward_signal.presence_reward) if reward_signal.presence_reward is not None else -math.inf,  # type: ignore
-        ] if elem is not None)
-        self._min_observed_reward = min(elem for elem in [
-            self._min_observed_reward,
-            np.min(reward_signal.combined_reward),  # type: ignore
-            np.min(reward_signal.audio_reward) if reward_signal.audio_reward is not None else math.inf,  # type: ignore
-            np.min(reward_signal.video_reward) if reward_signal.video_reward is not None else math.inf,  # type: ignore
-            np.min(reward_signal.presence_reward) if reward_signal.presence_reward is not None else math.inf,  # type: ignore
-        ] if elem is not None)
+        rewards = np.array([
+            reward_signal.combined_reward,
+            reward_signal.audio_reward if reward_signal.audio_reward is not None else np.nan,
+            reward_signal.video_reward if reward_signal.video_reward is not None else np.nan,
+            reward_signal.presence_reward,
+        ])
+        self._max_observed_reward = float(np.nanmax(np.append(rewards, self._max_observed_reward)))
+        self._min_observed_reward = float(np.nanmin(np.append(rewards, self._min_observed_reward)))
 
         self._ax_reward.set_xlim(left=timestamp_max - self._config.reward_window_width_s, right=time.time() - self._time_begin)
         self._ax_reward.set_ylim(bottom=self._min_observed_reward, top=self._max_observed_reward)
-        self._ax_reward.set_title('Reward')
-        self._ax_reward.set_ylabel('reward')
-        self._ax_reward.set_xlabel('time')
-        self._ax_reward.legend(loc='lower left')
 
-        mean_detected_video_emotions_this_frame = reward_signal.detected_video_emotions.mean()
-        mean_detected_audio_emotions_this_frame = reward_signal.detected_audio_emotions.mean()
+        RewardSignalVisualizer._set_bar_heights(
+            self._bars_video_live, reward_signal.video_emotion_labels, reward_signal.mean_detected_video_emotions)
+        RewardSignalVisualizer._set_bar_heights(
+            self._bars_audio_live, reward_signal.audio_emotion_labels, reward_signal.mean_detected_audio_emotions)
         if average_reward_signal is not None:
-            # TODO(TK): use np.typing.ArrayLike when numpy>=1.20
-            mean_detected_video_emotions_all_frames: typing.Optional[typing.Any] = average_reward_signal.detected_video_emotions.mean()
-            mean_detected_audio_emotions_all_frames: typing.Optional[typing.Any] = average_reward_signal.detected_audio_emotions.mean()
-        else:
-            mean_detected_video_emotions_all_frames = None
-            mean_detected_audio_emotions_all_frames = None
-
-        self._observed_emotions = sorted(
-            set(self._observed_emotions) |
-            set(mean_detected_video_emotions_this_frame.index) |
-            set(mean_detected_audio_emotions_this_frame.index)
-        )
-
-        self._ax_emotions_live.clear()
-        self._ax_emotions_live.bar(
-            x=np.arange(len(self._observed_emotions)) - 0.25,
-            height=[mean_detected_video_emotions_this_frame[emotion] if emotion in mean_detected_video_emotions_this_frame else 0.0
-                    for emotion in self._observed_emotions],
-            color=color_video,
-            width=0.5,
-            label='video',
-        )
-        self._ax_emotions_live.bar(
-            x=np.arange(len(self._observed_emotions)) + 0.25,
-            height=[mean_detected_audio_emotions_this_frame[emotion] if emotion in mean_detected_audio_emotions_this_frame else 0.0
-                    for emotion in self._observed_emotions],
-            color=color_audio,
-            width=0.5,
-            label='audio'
-        )
-        self._ax_emotions_live.set_ylim(bottom=0.0, top=1.0)
-        self._ax_emotions_live.set_xticks(np.arange(len(self._observed_emotions)))
-        self._ax_emotions_live.set_xticklabels(self._observed_emotions)
-        self._ax_emotions_live.set_title('Detected Emotions (Live)')
-        self._ax_emotions_live.legend(loc='upper right')
-
-        self._ax_emotions_average.clear()
-        if mean_detected_video_emotions_all_frames is not None:
-            self._ax_emotions_average.bar(
-                x=np.arange(len(self._observed_emotions)) - 0.25,
-                height=[mean_detected_video_emotions_all_frames[emotion] if emotion in mean_detected_video_emotions_all_frames else 0.0
-                        for emotion in self._observed_emotions],
-                color=color_video,
-                width=0.5,
-                label='video',
-            )
-        if mean_detected_audio_emotions_all_frames is not None:
-            self._ax_emotions_average.bar(
-                x=np.arange(len(self._observed_emotions)) + 0.25,
-                height=[mean_detected_audio_emotions_all_frames[emotion] if emotion in mean_detected_audio_emotions_all_frames else 0.0
-                        for emotion in self._observed_emotions],
-                color=color_audio,
-                width=0.5,
-                label='audio',
-            )
-        self._ax_emotions_average.set_ylim(bottom=0.0, top=1.0)
-        self._ax_emotions_average.set_xticks(np.arange(len(self._observed_emotions)))
-        self._ax_emotions_average.set_xticklabels(self._observed_emotions)
-        self._ax_emotions_average.set_title('Detected Emotions (Moving Average)')
-        self._ax_emotions_average.legend(loc='upper right')
+            RewardSignalVisualizer._set_bar_heights(
+                self._bars_video_average, average_reward_signal.video_emotion_labels, average_reward_signal.mean_detected_video_emotions)
+            RewardSignalVisualizer._set_bar_heights(
+                self._bars_audio_average, average_reward_signal.audio_emotion_labels, average_reward_signal.mean_detected_audio_emotions)
 
         self._draw()
 
@@ -1,4 +1,6 @@
 import asyncio
+import collections
+import concurrent.futures
 import ctypes
 import dataclasses
 import math
@@ -8,9 +10,12 @@ import sys
 import time
 import typing
 
+import cv2  # type: ignore
 import dataclasses_json
+import numba  # type: ignore
 import numpy as np
 import pandas as pd  # type: ignore
+import torch
 
 import emotion_recognition_using_speech.emotion_recognition
 from mevonai_speech_emotion_recognition.src.speechEmotionRecognition import \
@@ -18,9 +23,10 @@ from mevonai_speech_emotion_recognition.src.speechEmotionRecognition import \
 from residual_masking_network.rmn import RMN
 from social_reward_function.input.audio import AudioFrame
 from social_reward_function.input.video import VideoFrame
-from social_reward_function.util import CodeBlockTimer
+from social_reward_function.util import CodeBlockTimer, acquire_async
 
 Timestamp = float
+T = typing.TypeVar('T')
 
 
 @dataclasses.dataclass(frozen=True)
@@ -33,17 +39,81 @@ class EmotionProbabilities:
     disgusted: typing.Optional[float] = dataclasses.field(default=None)
     surprised: typing.Optional[float] = dataclasses.field(default=None)
 
+    @staticmethod
+    def to_array(emotion_probabilities: typing.Sequence['EmotionProbabilities']) -> typing.Any:
+        """
+        Converts to an array of shape (len(emotion_probabilities), len(EMOTIONS)) with columns ordered as per EMOTIONS.
+        None means no value provided by estimator, so is replaced with 0.0.
+        """
+
+        # TODO(TK): bring back types with numpy>=1.20
+        a_emotion_probabilities = np.zeros((len(emotion_probabilities), len(EMOTIONS)))
+        for idx, emotion_probs in enumerate(emotion_probabilities):
+            a_emotion_probabilities[idx] = [getattr(emotion_probs, emotion) or 0.0 for emotion in EMOTIONS]
+        return a_emotion_probabilities
+
+
+# Canonical order of emotions, e.g. for the columns of arrays of EmotionProbabilities:
+EMOTIONS: typing.Tuple[str, ...] = tuple(field.name for field in dataclasses.fields(EmotionProbabilities))
+
+
+@numba.njit(parallel=True, fastmath=True)  # type: ignore
+def _gray_to_rgb_tensor(images: typing.Any, out: typing.Any) -> None:
+    """
+    Scales (N, H, W) uint8 grayscale images to [0, 1] and replicates them across channels of out, a (N, 3, H, W) float32
+    array, as is expected by the RMN emotion model.
+    """
+
+    for n in numba.prange(images.shape[0]):
+        for i in range(images.shape[1]):
+            for j in range(images.shape[2]):
+                value = images[n, i, j] / 255.0
+                for c in range(3):
+                    out[n, c, i, j] = value
+
 
 class VideoEmotionRecognizer:
     def detect_emotion_for_single_frame(self, frame: typing.Any) -> typing.Iterable[EmotionProbabilities]:
         raise NotImplementedError()
 
+    def detect_emotion_for_batch(self, frames: typing.Sequence[typing.Any]) -> typing.List[typing.Iterable[EmotionProbabilities]]:
+        return [self.detect_emotion_for_single_frame(frame) for frame in frames]
+
 
 class RMNVideoEmotionRecognizer(VideoEmotionRecognizer):
     _emotions = frozenset(('neutral', 'happy', 'sad', 'angry', 'fear', 'disgust', 'surprise'))
+    _emotion_model_outputs = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')  # FER2013 label order
+    _face_image_size = (224, 224)
+    _min_face_size = 10  # pixels, as per RMN.detect_emotion_for_single_frame
+
+    def __init__(self, jit: bool = True, face_detection_period: int = 1) -> None:
+        if face_detection_period < 1:
+            raise ValueError(f"face_detection_period must be at least 1, got {face_detection_period}")
 
-    def __init__(self) -> None:
         self._rmn = RMN()  # type: ignore
+        self._device = next(self._rmn.emo_model.parameters()).device
+
+        # Faces move little between consecutive frames, so the face detector can be run only every face_detection_period
+        # frames in detect_emotion_for_batch. Reused faces may be stale, so by default faces are detected in every frame:
+        self._face_detection_period = face_detection_period
+        self._frames_since_face_detection = 0
+        self._last_faces: typing.List[typing.Dict[str, int]] = []
+
+        # Compile the preprocessing kernel up front, rather than on the first batch of faces:
+        _gray_to_rgb_tensor(
+            np.zeros((1, *self._face_image_size), dtype=np.uint8),
+            np.empty((1, 3, *self._face_image_size), dtype=np.float32),
+        )
+
+        # Compile the emotion model once with TorchScript, freezing its weights so it can be optimized for inference
+        # (torch.jit.optimize_for_inference is available, as a prototype, from torch 1.9.0):
+        if jit:
+            example_input = torch.rand(1, 3, *self._face_image_size, device=self._device)
+            emo_model = torch.jit.trace(self._rmn.emo_model.eval(), example_input)  # type: ignore
+            self._rmn.emo_model = torch.jit.optimize_for_inference(torch.jit.freeze(emo_model))
+
+        # On CUDA, batches are prepared in (reused) pinned host memory so they can be copied to the device asynchronously:
+        self._pinned_buffer: typing.Optional[torch.Tensor] = None
 
     def detect_emotion_for_single_frame(self, frame: typing.Any) -> typing.Iterable[EmotionProbabilities]:
         emotion_probabilities_all_faces = [
@@ -54,22 +124,91 @@ class RMNVideoEmotionRecognizer(VideoEmotionRecognizer):
              }
             for face in self._rmn.detect_emotion_for_single_frame(frame=frame)
         ]
-        for emotion_probabilities in emotion_probabilities_all_faces:
-            if len(set(emotion_probabilities.keys()) - self._emotions) != 0:
-                raise ValueError("Model returned unexpected emotions")
         return [
-            EmotionProbabilities(
-                happy=emotion_probabilities['happy'],
-                neutral=emotion_probabilities['neutral'],
-                sad=emotion_probabilities['sad'],
-                angry=emotion_probabilities['angry'],
-                fearful=emotion_probabilities['fear'],
-                disgusted=emotion_probabilities['disgust'],
-                surprised=emotion_probabilities['surprise'],
-            )
+            self._to_emotion_probabilities(emotion_probabilities)
             for emotion_probabilities in emotion_probabilities_all_faces
         ]
 
+    @torch.no_grad()
+    def detect_emotion_for_batch(self, frames: typing.Sequence[typing.Any]) -> typing.List[typing.Iterable[EmotionProbabilities]]:
+        """
+        Detects faces frame-by-frame (reusing recent detections, see _detect_faces), then classifies every face from every
+        frame in a single forward pass of the emotion model.
+        """
+
+        face_images: typing.List[typing.Any] = []
+        faces_per_frame: typing.List[int] = []
+        for frame in frames:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            face_images_this_frame = [
+                gray[face['ymin']:face['ymax'], face['xmin']:face['xmax']]
+                for face in self._detect_faces(frame)
+            ]
+            face_images_this_frame = [
+                face_image for face_image in face_images_this_frame
+                if face_image.shape[0] >= self._min_face_size and face_image.shape[1] >= self._min_face_size
+            ]
+            face_images.extend(face_images_this_frame)
+            faces_per_frame.append(len(face_images_this_frame))
+
+        if len(face_images) == 0:
+            return [[] for _ in frames]
+
+        batch = np.stack([cv2.resize(face_image, self._face_image_size) for face_image in face_images])
+        tensor = self._allocate_host_tensor((batch.shape[0], 3, batch.shape[1], batch.shape[2]))
+        _gray_to_rgb_tensor(batch, tensor.numpy())
+        tensor = tensor.to(self._device, non_blocking=True)
+        proba = torch.softmax(self._rmn.emo_model(tensor), dim=1).cpu().numpy()
+
+        # Map the faces back to the frames they were detected in:
+        idx_faces = np.cumsum([0] + faces_per_frame)
+        return [
+            [
+                self._to_emotion_probabilities(dict(zip(self._emotion_model_outputs, (float(p) for p in proba_face))))
+                for proba_face in proba[idx_begin:idx_end]
+            ]
+            for idx_begin, idx_end in zip(idx_faces[:-1], idx_faces[1:])
+        ]
+
+    def _detect_faces(self, frame: typing.Any) -> typing.List[typing.Dict[str, int]]:
+        """
+        Detects faces every face_detection_period frames, otherwise reuses the last detected faces. Faces are always
+        detected if none were last detected, so new faces are picked up immediately.
+        """
+
+        if self._frames_since_face_detection >= self._face_detection_period or len(self._last_faces) == 0:
+            self._last_faces = self._rmn.detect_faces(frame)
+            self._frames_since_face_detection = 0
+        self._frames_since_face_detection += 1
+        return self._last_faces
+
+    def _allocate_host_tensor(self, shape: typing.Tuple[int, ...]) -> torch.Tensor:
+        """
+        Returns a float32 host tensor to prepare a batch in. On CUDA this is a view of a pinned buffer, which is only
+        reallocated if it's too small. Reuse is safe as the previous batch's copy is complete once its results are
+        copied back to the host.
+        """
+
+        if self._device.type != 'cuda':
+            return torch.empty(shape, dtype=torch.float32)
+        numel = int(np.prod(shape))
+        if self._pinned_buffer is None or self._pinned_buffer.numel() < numel:
+            self._pinned_buffer = torch.empty(numel, dtype=torch.float32, pin_memory=True)
+        return self._pinned_buffer[:numel].view(shape)
+
+    def _to_emotion_probabilities(self, emotion_probabilities: typing.Dict[str, float]) -> EmotionProbabilities:
+        if len(set(emotion_probabilities.keys()) - self._emotions) != 0:
+            raise ValueError("Model returned unexpected emotions")
+        return EmotionProbabilities(
+            happy=emotion_probabilities['happy'],
+            neutral=emotion_probabilities['neutral'],
+            sad=emotion_probabilities['sad'],
+            angry=emotion_probabilities['angry'],
+            fearful=emotion_probabilities['fear'],
+            disgusted=emotion_probabilities['disgust'],
+            surprised=emotion_probabilities['surprise'],
+        )
+
 
 class AudioEmotionRecognizer:
     def predict_proba(self, audio_data: typing.Any, sample_rate: int) -> EmotionProbabilities:
@@ -160,6 +299,7 @@ class RewardSignalConfig:
     period_s: float
     threshold_audio_power: float
     threshold_latency_s: float
+    face_detection_period: int = dataclasses.field(default=1)  # frames, see RMNVideoEmotionRecognizer
 
     @property
     def s_video_coefficients(self) -> pd.Series:
@@ -194,8 +334,36 @@ class RewardSignal:
     video_reward: typing.Optional[float]
     presence_reward: float
     human_detected: bool
-    detected_audio_emotions: pd.DataFrame
-    detected_video_emotions: pd.DataFrame
+    # TODO(TK): bring back types with numpy>=1.20
+    detected_audio_emotion_probabilities: typing.Any  # shape (N, len(audio_emotion_labels))
+    detected_video_emotion_probabilities: typing.Any  # shape (N, len(video_emotion_labels))
+    audio_emotion_labels: typing.Tuple[str, ...] = dataclasses.field(default=EMOTIONS)
+    video_emotion_labels: typing.Tuple[str, ...] = dataclasses.field(default=EMOTIONS)
+
+    def __post_init__(self) -> None:
+        # Cache the mean detected emotions, as they're needed whenever a RewardSignal is printed or visualized:
+        object.__setattr__(self, '_mean_detected_audio_emotions', RewardSignal._mean(self.detected_audio_emotion_probabilities))
+        object.__setattr__(self, '_mean_detected_video_emotions', RewardSignal._mean(self.detected_video_emotion_probabilities))
+
+    @staticmethod
+    def _mean(emotion_probabilities: typing.Any) -> typing.Any:
+        if len(emotion_probabilities) == 0:
+            return np.full(emotion_probabilities.shape[1], np.nan)
+        return np.mean(emotion_probabilities, axis=0)
+
+    @property
+    def mean_detected_audio_emotions(self) -> typing.Any:
+        """
+        Mean probability of each of audio_emotion_labels, or NaN if no emotions were detected
+        """
+        return self._mean_detected_audio_emotions  # type: ignore
+
+    @property
+    def mean_detected_video_emotions(self) -> typing.Any:
+        """
+        Mean probability of each of video_emotion_labels, or NaN if no emotions were detected
+        """
+        return self._mean_detected_video_emotions  # type: ignore
 
     def __repr__(self) -> str:
         return f"RewardSignal(\n" \
@@ -205,10 +373,15 @@ class RewardSignal:
                f"\tvideo_reward={self.video_reward}\n" \
                f"\tpresence_reward={self.presence_reward}\n" \
                f"\thuman_detected={self.human_detected}\n" \
-               f"\tdetected_audio_emotions=\n{self.detected_audio_emotions.mean()}\n" \
-               f"\tdetected_video_emotions=\n{self.detected_video_emotions.mean()}\n" \
+               f"\tdetected_audio_emotions=\n{RewardSignal._format_emotions(self.audio_emotion_labels, self.mean_detected_audio_emotions)}\n" \
+               f"\tdetected_video_emotions=\n{RewardSignal._format_emotions(self.video_emotion_labels, self.mean_detected_video_emotions)}\n" \
                f")"
 
+    @staticmethod
+    def _format_emotions(labels: typing.Tuple[str, ...], values: typing.Any) -> str:
+        width = max((len(label) for label in labels), default=0) + 4
+        return '\n'.join(f"{label:<{width}}{value}" for label, value in zip(labels, values))
+
     def __add__(self, other: 'RewardSignal') -> 'RewardSignal':
         audio_reward = 0.0
         if self.audio_reward is not None:
@@ -222,6 +395,9 @@ class RewardSignal:
         if other.video_reward is not None:
             video_reward += other.video_reward
 
+        if self.audio_emotion_labels != other.audio_emotion_labels or self.video_emotion_labels != other.video_emotion_labels:
+            raise ValueError("Cannot add RewardSignals with different emotions")
+
         return RewardSignal(
             timestamp_s=max(self.timestamp_s, other.timestamp_s),
             combined_reward=self.combined_reward + other.combined_reward,
@@ -229,8 +405,12 @@ class RewardSignal:
             video_reward=video_reward,
             presence_reward=self.presence_reward + other.presence_reward,
             human_detected=self.human_detected or other.human_detected,
-            detected_audio_emotions=pd.concat([self.detected_audio_emotions, other.detected_audio_emotions]),
-            detected_video_emotions=pd.concat([self.detected_video_emotions, other.detected_video_emotions]),
+            detected_audio_emotion_probabilities=np.concatenate([
+                self.detected_audio_emotion_probabilities, other.detected_audio_emotion_probabilities]),
+            detected_video_emotion_probabilities=np.concatenate([
+                self.detected_video_emotion_probabilities, other.detected_video_emotion_probabilities]),
+            audio_emotion_labels=self.audio_emotion_labels,
+            video_emotion_labels=self.video_emotion_labels,
         )
 
     def __iadd__(self, other: 'RewardSignal') -> 'RewardSignal':
@@ -244,8 +424,10 @@ class RewardSignal:
             video_reward=self.video_reward / other if self.video_reward is not None else None,
             presence_reward=self.presence_reward / other,
             human_detected=self.human_detected,
-            detected_audio_emotions=self.detected_audio_emotions,
-            detected_video_emotions=self.detected_video_emotions,
+            detected_audio_emotion_probabilities=self.detected_audio_emotion_probabilities,
+            detected_video_emotion_probabilities=self.detected_video_emotion_probabilities,
+            audio_emotion_labels=self.audio_emotion_labels,
+            video_emotion_labels=self.video_emotion_labels,
         )
 
     def __itruediv__(self, other: typing.Union[int, float]) -> 'RewardSignal':
@@ -256,6 +438,16 @@ class RewardFunction:
     def __init__(self, config: RewardSignalConfig) -> None:
         self._config = config
 
+        # Validate once, as neither the coefficients nor the emotions change:
+        if frozenset(self._config.s_audio_coefficients.index) != frozenset(EMOTIONS):
+            raise ValueError(f"Unexpected audio emotions: got {self._config.s_audio_coefficients.index} expected {EMOTIONS}")
+        if frozenset(self._config.s_video_coefficients.index) != frozenset(EMOTIONS):
+            raise ValueError(f"Unexpected video emotions: got {self._config.s_video_coefficients.index} expected {EMOTIONS}")
+
+        # Coefficients ordered as per EMOTIONS, so rewards are a matrix-vector product with EmotionProbabilities.to_array:
+        self._a_video_coefficients = self._config.s_video_coefficients[list(EMOTIONS)].to_numpy()
+        self._a_audio_coefficients = self._config.s_audio_coefficients[list(EMOTIONS)].to_numpy()
+
         self._queue_video_frames: queue.Queue[VideoFrame] = multiprocessing.Queue()
         self._queue_audio_frames: queue.Queue[AudioFrame] = multiprocessing.Queue()
 
@@ -277,8 +469,8 @@ class RewardFunction:
         return ERUSAudioEmotionRecognizer(), MevonAIAudioEmotionRecognizer(),
 
     @staticmethod
-    def _load_video_classifiers() -> typing.Iterable[VideoEmotionRecognizer]:
-        return RMNVideoEmotionRecognizer(),
+    def _load_video_classifiers(face_detection_period: int) -> typing.Iterable[VideoEmotionRecognizer]:
+        return RMNVideoEmotionRecognizer(face_detection_period=face_detection_period),
 
     def stop(self) -> None:
         print("stopped")
@@ -314,8 +506,7 @@ class RewardFunction:
                 raise RuntimeError(f"{RewardFunction.__name__} already running")
             self._proc.start()
             while self._proc.is_alive() or not self._queue_reward_signal.empty():
-                if not self._semaphore_reward_signal.acquire(block=False):
-                    await asyncio.sleep(0)
+                if not await acquire_async(self._semaphore_reward_signal, timeout_s=1e-1):
                     continue
                 elem = self._queue_reward_signal.get()
                 yield elem
@@ -323,14 +514,26 @@ class RewardFunction:
             pass
 
     def _gen(self) -> None:
+        # The models release the GIL during inference, so threads are enough to overlap audio and video prediction
+        # (and avoid pickling the models or frames again):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            self._gen_reward_signals(executor=executor)
+
+    def _gen_reward_signals(self, executor: concurrent.futures.Executor) -> None:
         # Initialize emotion classifiers:
-        _video_classifiers = RewardFunction._load_video_classifiers()
+        _video_classifiers = RewardFunction._load_video_classifiers(face_detection_period=self._config.face_detection_period)
         _audio_classifiers = RewardFunction._load_audio_classifiers()
 
+        # Loop invariants:
+        weight_audio = self._config.audio_weights.overall
+        weight_video = self._config.video_weights.overall
+        weight_accompanied = self._config.presence_weights.accompanied
+        weight_alone = self._config.presence_weights.alone
+
         buffer_video_frames = [self._queue_video_frames.get(block=True, timeout=None)]
-        emotions_video_frames: typing.List[typing.Tuple[Timestamp, typing.Iterable[EmotionProbabilities]]] = []
+        emotions_video_frames: typing.Deque[typing.Tuple[Timestamp, typing.Iterable[EmotionProbabilities]]] = collections.deque()
         buffer_audio_frames = [self._queue_audio_frames.get(block=True, timeout=None)]
-        emotions_audio_frames: typing.List[typing.Tuple[Timestamp, EmotionProbabilities]] = []
+        emotions_audio_frames: typing.Deque[typing.Tuple[Timestamp, EmotionProbabilities]] = collections.deque()
         wallclock_initial = time.time()
         wallclock_next = wallclock_initial + self._config.period_s
 
@@ -367,62 +570,33 @@ class RewardFunction:
                 # than lose the data
                 # TODO(TK): sanity check there is no data which is *too* old being included!
                 if skip_release_periods:
-                    emotions_video_frames = [(timestamp_s, predicted_emotions)
-                                             for timestamp_s, predicted_emotions in emotions_video_frames
-                                             if timestamp_s > timestamp_prev]
-                    emotions_audio_frames = [(timestamp_s, predicted_emotions)
-                                             for timestamp_s, predicted_emotions in emotions_audio_frames
-                                             if timestamp_s > timestamp_prev]
+                    RewardFunction._pop_until(emotions_video_frames, timestamp_prev)
+                    RewardFunction._pop_until(emotions_audio_frames, timestamp_prev)
 
                 print("emotions_video_frames", emotions_video_frames)
                 print("emotions_audio_frames", emotions_audio_frames)
 
-                included_emotions_video_frames = [
-                    predicted_emotions for timestamp_s, predicted_emotions in emotions_video_frames
-                    if timestamp_s <= timestamp_next
-                ]
-                emotions_video_frames = [
-                    (timestamp_s, predicted_emotions) for timestamp_s, predicted_emotions in emotions_video_frames
-                    if timestamp_s > timestamp_next
-                ]
-                included_emotions_audio_frames = [
-                    predicted_emotions for timestamp_s, predicted_emotions in emotions_audio_frames
-                    if timestamp_s <= timestamp_next
-                ]
-                emotions_audio_frames = [
-                    (timestamp_s, predicted_emotions) for timestamp_s, predicted_emotions in emotions_audio_frames
-                    if timestamp_s > timestamp_next
-                ]
-
-                df_video_emotions = pd.DataFrame([
-                    emotion_probs.__dict__
+                included_emotions_video_frames = RewardFunction._pop_until(emotions_video_frames, timestamp_next)
+                included_emotions_audio_frames = RewardFunction._pop_until(emotions_audio_frames, timestamp_next)
+
+                a_video_emotions = EmotionProbabilities.to_array([
+                    emotion_probs
                     for emotion_probs_all_faces in included_emotions_video_frames
                     for emotion_probs in emotion_probs_all_faces
                 ])
-                df_audio_emotions = pd.DataFrame([
-                    emotion_probs.__dict__
-                    for emotion_probs in included_emotions_audio_frames
-                ])
-
-                # NaN means no value provided by estimator, so replace with 0.0:
-                df_video_emotions.fillna(0.0, inplace=True)
-                df_audio_emotions.fillna(0.0, inplace=True)
+                a_audio_emotions = EmotionProbabilities.to_array(included_emotions_audio_frames)
 
                 # Calculate the combined reward:
-                if not df_audio_emotions.empty and set(self._config.s_audio_coefficients.index) != set(df_audio_emotions.columns):
-                    raise ValueError(f"Unexpected audio emotions: got {df_audio_emotions.columns} expected {self._config.s_audio_coefficients.index}")
-                if not df_video_emotions.empty and set(self._config.s_video_coefficients.index) != set(df_video_emotions.columns):
-                    raise ValueError(f"Unexpected video emotions: got {df_video_emotions.columns} expected {self._config.s_video_coefficients.index}")
-                audio_reward = 0.0 if df_audio_emotions.empty else (self._config.s_audio_coefficients * df_audio_emotions).to_numpy().sum(axis=1).mean()
-                video_reward = 0.0 if df_video_emotions.empty else (self._config.s_video_coefficients * df_video_emotions).to_numpy().sum(axis=1).mean()
-                human_detected = not df_video_emotions.empty  # Only use video because audio is too prone to errors
+                audio_reward = 0.0 if len(a_audio_emotions) == 0 else float((a_audio_emotions @ self._a_audio_coefficients).mean())
+                video_reward = 0.0 if len(a_video_emotions) == 0 else float((a_video_emotions @ self._a_video_coefficients).mean())
+                human_detected = len(a_video_emotions) != 0  # Only use video because audio is too prone to errors
                 presence_reward = (
-                    self._config.presence_weights.accompanied * float(human_detected) +
-                    self._config.presence_weights.alone * float(not human_detected)
+                    weight_accompanied * float(human_detected) +
+                    weight_alone * float(not human_detected)
                 )
                 combined_reward = (
-                    self._config.audio_weights.overall * audio_reward +
-                    self._config.video_weights.overall * video_reward +
+                    weight_audio * audio_reward +
+                    weight_video * video_reward +
                     presence_reward
                 )
                 if not math.isfinite(video_reward):
@@ -439,8 +613,8 @@ class RewardFunction:
                     audio_reward=audio_reward,
                     presence_reward=presence_reward,
                     human_detected=human_detected,
-                    detected_video_emotions=df_video_emotions,
-                    detected_audio_emotions=df_audio_emotions,
+                    detected_video_emotion_probabilities=a_video_emotions,
+                    detected_audio_emotion_probabilities=a_audio_emotions,
                 ))
                 self._semaphore_reward_signal.release()
 
@@ -452,27 +626,64 @@ class RewardFunction:
             while not self._queue_video_frames.empty():
                 buffer_video_frames.append(self._queue_video_frames.get_nowait())
 
-            # Emotion predictions:
-            with CodeBlockTimer() as timer:
-                for video_classifier in _video_classifiers:
-                    emotions_video_frames_new = [
-                        (frame.timestamp_s, video_classifier.detect_emotion_for_single_frame(frame.video_data))
-                        for frame in buffer_video_frames
-                    ]
-                    emotions_video_frames.extend(emotions_video_frames_new)
-            if len(buffer_video_frames) != 0:
-                print(f'Video prediction took {timer.timedelta} '
-                      f'(={timer.timedelta / len(buffer_video_frames) if len(buffer_video_frames) else "NaN"} per frame)')
-            buffer_video_frames.clear()
-
+            # Emotion predictions (audio and video are independent, so are predicted concurrently):
             buffer_audio_frames = [frame for frame in buffer_audio_frames if np.mean(np.power(frame.audio_data, 2)) >= self._config.threshold_audio_power]
-            with CodeBlockTimer() as timer:
-                for audio_classifier in _audio_classifiers:
-                    emotions_audio_frames_new = [
-                        (frame.timestamp_s, audio_classifier.predict_proba(audio_data=frame.audio_data, sample_rate=frame.sample_rate))
-                        for frame in buffer_audio_frames
-                    ]
-                    emotions_audio_frames.extend(emotions_audio_frames_new)
-            if len(buffer_audio_frames) != 0:
-                print(f'Audio prediction took {timer.timedelta}')
-            buffer_audio_frames.clear()
+            future_emotions_video_frames = executor.submit(RewardFunction._predict_video, _video_classifiers, buffer_video_frames) \
+                if len(buffer_video_frames) != 0 else None
+            future_emotions_audio_frames = executor.submit(RewardFunction._predict_audio, _audio_classifiers, buffer_audio_frames) \
+                if len(buffer_audio_frames) != 0 else None
+            if future_emotions_video_frames is not None:
+                emotions_video_frames.extend(future_emotions_video_frames.result())
+            if future_emotions_audio_frames is not None:
+                emotions_audio_frames.extend(future_emotions_audio_frames.result())
+            buffer_video_frames = []
+            buffer_audio_frames = []
+
+    @staticmethod
+    def _pop_until(emotions: typing.Deque[typing.Tuple[Timestamp, T]], timestamp_s: Timestamp) -> typing.List[T]:
+        """
+        Pops the predictions up to and including timestamp_s. Predictions must be in timestamp order, so these are always
+        at the front
+        """
+
+        popped = []
+        while len(emotions) != 0 and emotions[0][0] <= timestamp_s:
+            popped.append(emotions.popleft()[1])
+        return popped
+
+    @staticmethod
+    def _predict_video(
+            video_classifiers: typing.Iterable[VideoEmotionRecognizer],
+            video_frames: typing.List[VideoFrame],
+    ) -> typing.List[typing.Tuple[Timestamp, typing.Iterable[EmotionProbabilities]]]:
+        emotions_video_frames: typing.List[typing.Tuple[Timestamp, typing.Iterable[EmotionProbabilities]]] = []
+        with CodeBlockTimer() as timer:
+            for video_classifier in video_classifiers:
+                emotions_video_frames.extend(zip(
+                    (frame.timestamp_s for frame in video_frames),
+                    video_classifier.detect_emotion_for_batch([frame.video_data for frame in video_frames]),
+                ))
+        if len(video_frames) != 0:
+            print(f'Video prediction took {timer.timedelta} '
+                  f'(={timer.timedelta / len(video_frames) if len(video_frames) else "NaN"} per frame)')
+        # Predictions are grouped by classifier, but must be in timestamp order (see _pop_until):
+        emotions_video_frames.sort(key=lambda elem: elem[0])
+        return emotions_video_frames
+
+    @staticmethod
+    def _predict_audio(
+            audio_classifiers: typing.Iterable[AudioEmotionRecognizer],
+            audio_frames: typing.List[AudioFrame],
+    ) -> typing.List[typing.Tuple[Timestamp, EmotionProbabilities]]:
+        emotions_audio_frames: typing.List[typing.Tuple[Timestamp, EmotionProbabilities]] = []
+        with CodeBlockTimer() as timer:
+            for audio_classifier in audio_classifiers:
+                emotions_audio_frames.extend(
+                    (frame.timestamp_s, audio_classifier.predict_proba(audio_data=frame.audio_data, sample_rate=frame.sample_rate))
+                    for frame in audio_frames
+                )
+        if len(audio_frames) != 0:
+            print(f'Audio prediction took {timer.timedelta}')
+        # Predictions are grouped by classifier, but must be in timestamp order (see _pop_until):
+        emotions_audio_frames.sort(key=lambda elem: elem[0])
+        return emotions_audio_frames
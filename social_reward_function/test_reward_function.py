@@ -1,6 +1,17 @@
+import collections
+import copy
+import dataclasses
+import typing
+
+import numpy as np
 import pandas as pd  # type: ignore
+import pytest
+import torch
 
-from social_reward_function.reward_function import RewardSignalConfig, EmotionWeights
+import social_reward_function.reward_function
+from social_reward_function.input.audio import AudioFrame
+from social_reward_function.reward_function import RewardSignalConfig, EmotionWeights, EmotionProbabilities, EMOTIONS, \
+    RMNVideoEmotionRecognizer, _gray_to_rgb_tensor, AudioEmotionRecognizer, RewardFunction, PresenceWeights
 
 
 def test_reward_function_constants_from_dict() -> None:
@@ -102,3 +113,233 @@ def test_reward_function_constants_series() -> None:
         'surprised': 0.0,
         'neutral': 0.0,
     }))
+
+
+def test_emotion_probabilities_to_array() -> None:
+    a_emotion_probabilities = EmotionProbabilities.to_array([
+        EmotionProbabilities(happy=0.7, neutral=0.2, sad=0.1),
+        EmotionProbabilities(happy=0.1, neutral=0.1, sad=0.1, angry=0.2, fearful=0.2, disgusted=0.2, surprised=0.1),
+    ])
+    assert EMOTIONS == ('happy', 'neutral', 'sad', 'angry', 'fearful', 'disgusted', 'surprised')
+    assert np.array_equal(a_emotion_probabilities, np.array([
+        [0.7, 0.2, 0.1, 0.0, 0.0, 0.0, 0.0],
+        [0.1, 0.1, 0.1, 0.2, 0.2, 0.2, 0.1],
+    ]))
+    assert EmotionProbabilities.to_array([]).shape == (0, len(EMOTIONS))
+
+
+class _RewardSignalConfigMissingAudioEmotion(RewardSignalConfig):
+    @property
+    def s_audio_coefficients(self) -> pd.Series:
+        return super().s_audio_coefficients.drop('neutral')
+
+
+class _RewardSignalConfigUnexpectedVideoEmotion(RewardSignalConfig):
+    @property
+    def s_video_coefficients(self) -> pd.Series:
+        return pd.concat([super().s_video_coefficients, pd.Series({'bored': 0.0})])
+
+
+@pytest.mark.parametrize('config_type', [_RewardSignalConfigMissingAudioEmotion, _RewardSignalConfigUnexpectedVideoEmotion])
+def test_reward_function_mismatched_coefficients(config_type: typing.Type[RewardSignalConfig]) -> None:
+    emotion_weights = EmotionWeights(overall=1.0, angry=-1.0, disgusted=-1.0, fearful=-1.0, happy=1.0, sad=-1.0, surprised=0.0, neutral=0.0)
+    config = config_type(
+        audio_weights=emotion_weights,
+        video_weights=emotion_weights,
+        presence_weights=PresenceWeights(accompanied=1.0, alone=0.0),
+        period_s=2.0,
+        threshold_audio_power=0.01,
+        threshold_latency_s=5.0,
+    )
+    with pytest.raises(ValueError):
+        RewardFunction(config=config)
+
+
+class _ConstantAudioEmotionRecognizer(AudioEmotionRecognizer):
+    def __init__(self, happy: float) -> None:
+        self._happy = happy
+
+    def predict_proba(self, audio_data: typing.Any, sample_rate: int) -> EmotionProbabilities:
+        return EmotionProbabilities(happy=self._happy)
+
+
+def test_reward_function_pop_predictions_multiple_classifiers() -> None:
+    audio_classifiers = [_ConstantAudioEmotionRecognizer(happy=0.1), _ConstantAudioEmotionRecognizer(happy=0.2)]
+    audio_frames = [
+        AudioFrame(timestamp_s=timestamp_s, audio_data=np.zeros(16), sample_rate=16000)
+        for timestamp_s in [1.5, 2.5]
+    ]
+    emotions_audio_frames = collections.deque(RewardFunction._predict_audio(audio_classifiers, audio_frames))
+
+    # Both classifiers' predictions for frames on either side of the release are included with their own period:
+    assert RewardFunction._pop_until(emotions_audio_frames, 2.0) == [
+        EmotionProbabilities(happy=0.1),
+        EmotionProbabilities(happy=0.2),
+    ]
+    assert RewardFunction._pop_until(emotions_audio_frames, 3.0) == [
+        EmotionProbabilities(happy=0.1),
+        EmotionProbabilities(happy=0.2),
+    ]
+    assert len(emotions_audio_frames) == 0
+
+
+def test_gray_to_rgb_tensor() -> None:
+    images = np.random.default_rng(42).integers(0, 256, size=(3, 17, 11), dtype=np.uint8)
+    out = np.empty((3, 3, 17, 11), dtype=np.float32)
+    _gray_to_rgb_tensor(images, out)
+    assert np.allclose(out, np.repeat(images[:, None] / 255.0, 3, 1))
+
+
+class _StubEmotionModel(torch.nn.Module):
+    """
+    Classifies each face by its (uniform) intensity: a face of intensity 30 * idx is classified as the idx'th emotion
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._unused = torch.nn.Parameter(torch.zeros(1))
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        idx = torch.round(x[:, 0].mean(dim=(1, 2)) * 255.0 / 30.0).long()
+        return 100.0 * torch.nn.functional.one_hot(idx, num_classes=7).float()
+
+
+class _StubRMN:
+    def __init__(self, emo_model: typing.Optional[torch.nn.Module] = None) -> None:
+        self.emo_model = emo_model if emo_model is not None else _StubEmotionModel()
+        self.faces: typing.List[typing.List[typing.Dict[str, int]]] = []
+        self.n_detect_faces_calls = 0
+
+    def detect_faces(self, frame: typing.Any) -> typing.List[typing.Dict[str, int]]:
+        self.n_detect_faces_calls += 1
+        return self.faces.pop(0)
+
+
+@pytest.fixture
+def stub_rmn(monkeypatch: pytest.MonkeyPatch) -> _StubRMN:
+    rmn = _StubRMN()
+    monkeypatch.setattr(social_reward_function.reward_function, 'RMN', lambda: rmn)
+    return rmn
+
+
+def _face(xmin: int, ymin: int, size: int = 20) -> typing.Dict[str, int]:
+    return {'xmin': xmin, 'ymin': ymin, 'xmax': xmin + size, 'ymax': ymin + size}
+
+
+def test_rmn_detect_faces_reuses_detections(stub_rmn: _StubRMN) -> None:
+    recognizer = RMNVideoEmotionRecognizer(jit=False, face_detection_period=3)
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    faces = [_face(0, 0)]
+
+    stub_rmn.faces = [[], faces, faces]
+    assert recognizer._detect_faces(frame) == []
+    assert recognizer._detect_faces(frame) == faces  # no faces last detected, so detect again
+    assert stub_rmn.n_detect_faces_calls == 2
+    assert recognizer._detect_faces(frame) == faces
+    assert recognizer._detect_faces(frame) == faces
+    assert stub_rmn.n_detect_faces_calls == 2
+    assert recognizer._detect_faces(frame) == faces
+    assert stub_rmn.n_detect_faces_calls == 3
+
+
+def test_rmn_detect_faces_every_frame_by_default(stub_rmn: _StubRMN) -> None:
+    recognizer = RMNVideoEmotionRecognizer(jit=False)
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+
+    stub_rmn.faces = [[_face(0, 0)] for _ in range(3)]
+    for _ in range(3):
+        recognizer._detect_faces(frame)
+    assert stub_rmn.n_detect_faces_calls == 3
+
+
+def test_rmn_detect_faces_invalid_period(stub_rmn: _StubRMN) -> None:
+    with pytest.raises(ValueError):
+        RMNVideoEmotionRecognizer(jit=False, face_detection_period=0)
+
+
+def test_reward_function_face_detection_period(stub_rmn: _StubRMN) -> None:
+    d_config = {
+        'audio_weights': {'overall': 0.5, 'angry': 0.0, 'disgusted': 0.0, 'fearful': 0.0, 'happy': 0.0, 'sad': 0.0, 'surprised': 0.0, 'neutral': 0.0},
+        'video_weights': {'overall': 0.5, 'angry': 0.0, 'disgusted': 0.0, 'fearful': 0.0, 'happy': 0.0, 'sad': 0.0, 'surprised': 0.0, 'neutral': 0.0},
+        'presence_weights': {'accompanied': 0.0, 'alone': 0.0},
+        'period_s': 2.0,
+        'threshold_audio_power': 0.01,
+        'threshold_latency_s': 5.0,
+    }
+    assert RewardSignalConfig.from_dict(d_config).face_detection_period == 1  # type: ignore
+    config = RewardSignalConfig.from_dict({**d_config, 'face_detection_period': 3})  # type: ignore
+    assert config.face_detection_period == 3
+
+    video_classifier, = RewardFunction._load_video_classifiers(face_detection_period=config.face_detection_period)
+    assert isinstance(video_classifier, RMNVideoEmotionRecognizer)
+    assert video_classifier._face_detection_period == 3
+
+
+def test_rmn_detect_emotion_for_batch(stub_rmn: _StubRMN) -> None:
+    recognizer = RMNVideoEmotionRecognizer(jit=False)
+
+    # Each frame holds faces of the given emotions (by index into the model outputs), side by side:
+    emotions_per_frame = [[3], [], [0, 6, 4], [5, 1]]
+    frames = []
+    for emotions in emotions_per_frame:
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        faces = []
+        for idx_face, idx_emotion in enumerate(emotions):
+            face = _face(xmin=30 * idx_face, ymin=0)
+            frame[face['ymin']:face['ymax'], face['xmin']:face['xmax']] = 30 * idx_emotion
+            faces.append(face)
+        frames.append(frame)
+        stub_rmn.faces.append(faces)
+    # Faces smaller than RMN's minimum face size are ignored:
+    stub_rmn.faces[1] = [_face(0, 0, size=5)]
+
+    emotions_detected = recognizer.detect_emotion_for_batch(frames)
+
+    assert len(emotions_detected) == len(frames)
+    for emotions, emotion_probabilities in zip(emotions_per_frame, emotions_detected):
+        emotion_probabilities = list(emotion_probabilities)
+        assert len(emotion_probabilities) == len(emotions)
+        for idx_emotion, probabilities in zip(emotions, emotion_probabilities):
+            expected = recognizer._to_emotion_probabilities({
+                emotion: 1.0 if idx == idx_emotion else 0.0
+                for idx, emotion in enumerate(RMNVideoEmotionRecognizer._emotion_model_outputs)
+            })
+            assert np.allclose(dataclasses.astuple(probabilities), dataclasses.astuple(expected))
+
+
+def test_rmn_detect_emotion_for_batch_no_faces(stub_rmn: _StubRMN) -> None:
+    recognizer = RMNVideoEmotionRecognizer(jit=False)
+    stub_rmn.faces = [[], []]
+    frames = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(2)]
+    assert recognizer.detect_emotion_for_batch(frames) == [[], []]
+
+
+def test_rmn_detect_emotion_for_batch_jit(monkeypatch: pytest.MonkeyPatch) -> None:
+    torch.manual_seed(42)
+    emo_model = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, kernel_size=3, stride=4),
+        torch.nn.BatchNorm2d(4),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(4, 7),
+    ).eval()  # as is RMN's emotion model
+    faces = [[_face(0, 0), _face(30, 0)], [_face(0, 30)], [_face(30, 30, size=40)]]
+    rng = np.random.default_rng(42)
+    frames = [rng.integers(0, 256, size=(100, 100, 3), dtype=np.uint8) for _ in faces]
+
+    def detect_emotion_for_batch(jit: bool) -> typing.List[typing.List[EmotionProbabilities]]:
+        rmn = _StubRMN(emo_model=copy.deepcopy(emo_model))
+        rmn.faces = list(faces)
+        monkeypatch.setattr(social_reward_function.reward_function, 'RMN', lambda: rmn)
+        # The model is traced with a batch of one face, but must generalise to batches of any size:
+        recognizer = RMNVideoEmotionRecognizer(jit=jit)
+        return [list(emotion_probabilities) for emotion_probabilities in recognizer.detect_emotion_for_batch(frames)]
+
+    emotions_eager = detect_emotion_for_batch(jit=False)
+    emotions_jit = detect_emotion_for_batch(jit=True)
+
+    assert [len(elem) for elem in emotions_jit] == [len(elem) for elem in faces]
+    for emotions_frame_eager, emotions_frame_jit in zip(emotions_eager, emotions_jit):
+        for probabilities_eager, probabilities_jit in zip(emotions_frame_eager, emotions_frame_jit):
+            assert np.allclose(dataclasses.astuple(probabilities_eager), dataclasses.astuple(probabilities_jit), atol=1e-6)
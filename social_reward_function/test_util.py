@@ -1,8 +1,9 @@
 # type: ignore
 
 import asyncio
+import multiprocessing
 
-from social_reward_function.util import interleave_fifo, TaggedItem
+from social_reward_function.util import interleave_fifo, TaggedItem, acquire_async
 
 
 def test_interleave_fifo() -> None:
@@ -91,3 +92,13 @@ def test_interleave_fifo_stop_at_last() -> None:
         TaggedItem[dict](tags=('1',), item={'timestamp': 4.5, 'y': 3.0}),
         TaggedItem[dict](tags=('1',), item={'timestamp': 5.5, 'y': 4.0}),
     ]
+
+
+def test_acquire_async() -> None:
+    semaphore = multiprocessing.Semaphore(value=0)
+
+    async def acquire_twice():
+        semaphore.release()
+        return [await acquire_async(semaphore, timeout_s=1e-2) for _ in range(2)]
+
+    assert asyncio.run(acquire_twice()) == [True, False]
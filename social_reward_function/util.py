@@ -1,5 +1,6 @@
 import asyncio
 import dataclasses
+import functools
 import time
 from asyncio import Task
 import datetime
@@ -79,6 +80,16 @@ async def async_gen_callback_wrapper(
         callback()
 
 
+async def acquire_async(semaphore: typing.Any, timeout_s: float) -> bool:
+    """
+    Acquires a (e.g. multiprocessing) semaphore by blocking in the event loop's default executor, so the event loop is free
+    to run other tasks while waiting. Returns whether the semaphore was acquired within timeout_s.
+    """
+
+    loop = asyncio.get_running_loop()
+    return typing.cast(bool, await loop.run_in_executor(None, functools.partial(semaphore.acquire, block=True, timeout=timeout_s)))
+
+
 class CodeBlockTimer:
     def __init__(self) -> None:
         self.__begin_time: typing.Optional[float] = None